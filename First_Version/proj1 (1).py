@@ -1,60 +1,308 @@
+import os
+import queue
+import sys
+import threading
+
+# Must be set before cv2 is imported: controls how many stripes the
+# cascade detector splits the image into (>= 3x cores works best)
+os.environ.setdefault('OPENCV_OBJECT_DETECT_STRIPES', '12')
+
 import cv2
 import numpy as np
 import time
 
+# Make sure the cascade's worker pool actually has threads to stripe
+# across (OpenCV can default to 1 depending on build/platform)
+cv2.setNumThreads(os.cpu_count() or 4)
+
 # Thresholds
 EYE_AR_THRESH = 0.25
 DROWSY_FRAMES = 15
 DISTRACTION_WARN = 5
 DISTRACTION_ALARM = 10
 
-def eye_aspect_ratio(eye_h, eye_w):
-    """Calculate eye openness ratio"""
-    return eye_h / (eye_w + 1e-6)
+# Loop timing runs on time.monotonic_ns(): integer math, no float
+# conversion, and immune to wall-clock (NTP) steps
+ONE_SEC_NS = 1_000_000_000
+HALF_SEC_NS = 500_000_000
+FULL_DETECT_INTERVAL = 15  # frames between full-frame face re-detections
+MOTION_PIXEL_THRESH = 15  # gray-level delta for a pixel to count as moved
+MOTION_MIN_FRAC = 0.005  # fraction of moved pixels below which we skip detection
+
+# Canny pruning skips flat regions; FIND_BIGGEST_OBJECT stops after the
+# strongest hit, which is the face we'd pick with max(area) anyway
+FACE_DETECT_FLAGS = cv2.CASCADE_DO_CANNY_PRUNING | cv2.CASCADE_FIND_BIGGEST_OBJECT
+
+class FrameGrabber:
+    """Reads camera frames on a background thread, keeping only the newest.
+
+    Decouples the blocking cap.read() from detection so the main loop runs
+    at CPU-bound rate instead of camera-bound rate and never sees a stale
+    buffered frame.
+    """
+    def __init__(self, cap):
+        self.cap = cap
+        self.lock = threading.Lock()
+        self.latest = None
+        self.running = True
+        self.thread = threading.Thread(target=self._reader, daemon=True)
+        self.thread.start()
+
+    def _reader(self):
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.running = False
+                break
+            with self.lock:
+                self.latest = frame
+
+    def get_latest(self):
+        """Return the most recent frame (or None if nothing new), non-blocking"""
+        with self.lock:
+            frame = self.latest
+            self.latest = None
+        return frame
+
+    def stop(self):
+        self.running = False
+        self.thread.join(timeout=1)
+
+def create_gpu_face_cascade():
+    """Return a CUDA face cascade, or None when no usable GPU is present"""
+    try:
+        if cv2.cuda.getCudaEnabledDeviceCount() > 0:
+            gpu = cv2.cuda.CascadeClassifier.create(
+                cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            gpu.setScaleFactor(1.1)
+            gpu.setMinNeighbors(5)
+            gpu.setMinObjectSize((60, 60))
+            gpu.setFindLargestObject(True)
+            return gpu
+    except (AttributeError, cv2.error):
+        pass
+    return None
+
+def run_face_cascade(face_cascade, face_gpu, img):
+    """Run the face cascade on `img`, offloading to the GPU when available"""
+    if face_gpu is not None:
+        gmat = cv2.cuda_GpuMat()
+        gmat.upload(img)
+        faces = face_gpu.detectMultiScale(gmat).download()
+        return faces.reshape(-1, 4) if faces is not None else ()
+    return face_cascade.detectMultiScale(img, 1.1, 5,
+                                         flags=FACE_DETECT_FLAGS, minSize=(60, 60))
+
+def detect_face_tracked(face_cascade, face_gpu, small, prev_face, frame_idx):
+    """Detect the face, searching only around last frame's hit.
+
+    The driver's face barely moves between adjacent frames, so the cascade
+    is run on the previous box padded by ~30%; a full-frame scan happens
+    only every FULL_DETECT_INTERVAL frames or when the ROI comes up empty.
+    """
+    sh, sw = small.shape[:2]
+    if prev_face is not None and frame_idx % FULL_DETECT_INTERVAL != 0:
+        (px, py, pw, ph) = prev_face
+        pad_x = int(pw * 0.3)
+        pad_y = int(ph * 0.3)
+        x0 = max(px - pad_x, 0)
+        y0 = max(py - pad_y, 0)
+        x1 = min(px + pw + pad_x, sw)
+        y1 = min(py + ph + pad_y, sh)
+        faces = run_face_cascade(face_cascade, face_gpu, small[y0:y1, x0:x1])
+        if len(faces) > 0:
+            # Translate rects back to full-image coordinates
+            return faces + (x0, y0, 0, 0)
+    return run_face_cascade(face_cascade, face_gpu, small)
+
+class DisplayWindow:
+    """Shows frames on a dedicated thread so the detection loop never
+    waits on the window compositor.
+
+    Frames are pushed through a one-slot queue (drop-on-full); keys seen
+    by waitKey are handed back through get_key().
+    """
+    def __init__(self, title):
+        self.title = title
+        self.frames = queue.Queue(maxsize=1)
+        self.keys = queue.Queue()
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        while self.running:
+            try:
+                frame = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            cv2.imshow(self.title, frame)
+            key = cv2.waitKey(1) & 0xFF
+            if key != 255:
+                self.keys.put(key)
+        cv2.destroyAllWindows()
+
+    def show(self, frame):
+        """Queue a frame for display, dropping it if the UI is busy"""
+        try:
+            self.frames.put_nowait(frame)
+        except queue.Full:
+            pass
+
+    def get_key(self):
+        """Most recent key pressed in the window, or None"""
+        key = None
+        while not self.keys.empty():
+            key = self.keys.get_nowait()
+        return key
+
+    def stop(self):
+        self.running = False
+        self.thread.join(timeout=1)
+
+# Status labels come from a tiny fixed set, so each (text, scale, color)
+# combination is rasterized once and blitted afterwards instead of paying
+# glyph rasterization in putText every frame
+_text_tiles = {}
+
+def draw_cached_text(frame, text, org, scale, color, thickness):
+    """cv2.putText replacement for fixed labels: rasterize once, then blit"""
+    key = (text, scale, color, thickness)
+    entry = _text_tiles.get(key)
+    if entry is None:
+        (tw, th), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+        tile = np.zeros((th + baseline, tw, 3), dtype=np.uint8)
+        cv2.putText(tile, text, (0, th), cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness)
+        mask = (tile.sum(axis=2) > 0).astype(np.uint8)
+        entry = (tile, mask, th)
+        _text_tiles[key] = entry
+
+    tile, mask, ascent = entry
+    x, y = org  # putText origin: baseline-left
+    y0 = max(y - ascent, 0)
+    x0 = max(x, 0)
+    y1 = min(y0 + tile.shape[0], frame.shape[0])
+    x1 = min(x0 + tile.shape[1], frame.shape[1])
+    if y0 >= y1 or x0 >= x1:
+        return
+    cv2.copyTo(tile[:y1 - y0, :x1 - x0], mask[:y1 - y0, :x1 - x0], frame[y0:y1, x0:x1])
+
+def eye_aspect_ratio(eyes):
+    """Mean eye openness ratio (height/width) over detected eye boxes"""
+    eyes = np.asarray(eyes, dtype=np.float32)
+    return float((eyes[:, 3] / (eyes[:, 2] + 1e-6)).mean())
+
+def open_camera():
+    """Open the webcam with minimal capture latency"""
+    # Force V4L2 on Linux so CAP_PROP_BUFFERSIZE actually takes effect
+    # (the default MSMF/GStreamer backends ignore it)
+    if sys.platform.startswith('linux'):
+        cap = cv2.VideoCapture(0, cv2.CAP_V4L2)
+    else:
+        cap = cv2.VideoCapture(0)
+    # Keep only 1 frame queued so detection always sees the freshest frame
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    # MJPG avoids the camera streaming uncompressed YUYV at full resolution
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    return cap
 
 def main():
     # Initialize
-    cap = cv2.VideoCapture(0)
+    cap = open_camera()
     face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
     eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+    face_gpu = create_gpu_face_cascade()
+    if face_gpu is not None:
+        print("CUDA device found, running face cascade on GPU")
     
     # Counters
     distraction_timer = 0
     drowsy_count = 0
-    last_update = time.time()
+    last_update_ns = time.monotonic_ns()
+    prev_face = None  # last face rect in half-res coordinates
+    prev_eyes = ()
+    prev_gray = None
+    frame_idx = 0
+    eye_tick = 0  # eye cascade runs on alternate ticks only
+    gray_bufs = None  # allocated once the frame size is known
+    small_buf = None
     
+    grabber = FrameGrabber(cap)
+    display = DisplayWindow("Driver Monitor")
+
     print("Driver Monitor Started. Press 'Q' to quit.")
-    
+
     while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
+        frame = grabber.get_latest()
+        if frame is None:
+            if not grabber.running:
+                break
+            time.sleep(0.001)  # wait for the grabber to produce a frame
+            continue
+
         frame = cv2.flip(frame, 1)
         h, w = frame.shape[:2]
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Detect face
-        faces = face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(120, 120))
-        
-        current_time = time.time()
+        # Frame size never changes, so the gray and downscale buffers are
+        # allocated once and rewritten in place each frame; two gray
+        # buffers ping-pong so prev_gray stays valid for the motion diff
+        if gray_bufs is None:
+            gray_bufs = [np.empty((h, w), dtype=np.uint8), np.empty((h, w), dtype=np.uint8)]
+            small_buf = np.empty((h // 2, w // 2), dtype=np.uint8)
+        gray = gray_bufs[1] if prev_gray is gray_bufs[0] else gray_bufs[0]
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        eye_tick += 1
+
+        # The camera is static: when the frame diff is near zero, last
+        # frame's detections are still valid and the cascades can be skipped
+        if prev_gray is not None and prev_face is not None:
+            diff = cv2.absdiff(gray, prev_gray)
+            motion = cv2.countNonZero(cv2.threshold(diff, MOTION_PIXEL_THRESH, 1, cv2.THRESH_BINARY)[1])
+            still = motion < MOTION_MIN_FRAC * w * h
+        else:
+            still = False
+        prev_gray = gray
+
+        if still:
+            face_rect = np.asarray(prev_face)
+            eyes = prev_eyes
+        else:
+            # Detect face on a half-resolution image (~4x cheaper); a face
+            # >= 120 px at full res is still >= 60 px here, so nothing is lost
+            cv2.resize(gray, (small_buf.shape[1], small_buf.shape[0]),
+                       dst=small_buf, interpolation=cv2.INTER_AREA)
+            small = small_buf
+            faces = detect_face_tracked(face_cascade, face_gpu, small, prev_face, frame_idx)
+            frame_idx += 1
+            prev_face = None
+            face_rect = None
+            if len(faces) > 0:
+                # FIND_BIGGEST_OBJECT returns at most one face
+                face_rect = faces[0]
+                prev_face = tuple(face_rect)
+
+        t_ns = time.monotonic_ns()
         distracted = True
         status = "NO FACE"
         color = (0, 0, 255)
-        
-        if len(faces) > 0:
-            # Get largest face
-            (x, y, fw, fh) = max(faces, key=lambda r: r[2] * r[3])
+
+        if face_rect is not None:
+            # Scale the half-res rect back up to full-frame coordinates
+            (x, y, fw, fh) = np.asarray(face_rect) * 2
             cv2.rectangle(frame, (x, y), (x + fw, y + fh), (255, 0, 0), 2)
-            
-            # Detect eyes in face region
+
+            # Detect eyes in face region, but only every other frame: the
+            # reused boxes give the same EAR and the drowsy count still ticks
             face_roi = gray[y:y+fh, x:x+fw]
-            eyes = eye_cascade.detectMultiScale(face_roi, 1.1, 10, minSize=(20, 20))
-            
+            if not still and eye_tick % 2 == 1:
+                eyes = eye_cascade.detectMultiScale(face_roi, 1.1, 10, minSize=(20, 20))
+                prev_eyes = eyes
+            else:
+                eyes = prev_eyes
+
             if len(eyes) >= 2:
-                # Calculate eye aspect ratio
+                # Calculate eye aspect ratio (vectorized over both eyes)
                 eyes = sorted(eyes, key=lambda e: e[0])[:2]
-                ear = np.mean([eye_aspect_ratio(e[3], e[2]) for e in eyes])
+                ear = eye_aspect_ratio(eyes)
                 
                 # Draw eyes
                 for (ex, ey, ew, eh) in eyes:
@@ -77,15 +325,15 @@ def main():
                     distracted = False
         
         # Update distraction timer
-        if current_time - last_update >= 1:
+        if t_ns - last_update_ns >= ONE_SEC_NS:
             if distracted:
                 distraction_timer += 1
             else:
                 distraction_timer = 0
-            last_update = current_time
+            last_update_ns = t_ns
         
         # Display status
-        cv2.putText(frame, status, (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.5, color, 3)
+        draw_cached_text(frame, status, (20, 50), 1.5, color, 3)
         
         # Show warnings
         if distraction_timer >= DISTRACTION_WARN:
@@ -93,21 +341,21 @@ def main():
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 165, 255), 2)
         
         if distraction_timer >= DISTRACTION_ALARM:
-            cv2.putText(frame, "!!! ALARM !!!", (w - 250, h - 40), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3)
+            draw_cached_text(frame, "!!! ALARM !!!", (w - 250, h - 40), 1.2, (0, 0, 255), 3)
             print('\a')  # Beep
             
             # Flash border
-            if int(current_time * 2) % 2 == 0:
+            if (t_ns // HALF_SEC_NS) % 2 == 0:
                 cv2.rectangle(frame, (0, 0), (w, h), (0, 0, 255), 20)
         
-        cv2.imshow("Driver Monitor", frame)
-        
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        display.show(frame)
+
+        if display.get_key() == ord('q'):
             break
-    
+
+    grabber.stop()
+    display.stop()
     cap.release()
-    cv2.destroyAllWindows()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file